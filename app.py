@@ -4,9 +4,16 @@
  Features:
    - Per-page real-time progress bar
    - Password-protected API access
-   - Compact DOCX (matches original book layout)
+   - Compact DOCX (matches original book layout), streamed to disk
+   - Markdown & EPUB export
    - Multi-API: Anthropic + OpenAI + Gemini
    - Translator name mandatory with admin panel
+   - Optional background prefetch of the next batch during review
+   - Repair queue: re-translate only failed / suspect pages
+   - Server-wide fair scheduler with global & per-key concurrency caps
+   - Rerun profiler (Admin Panel) + cached extraction, exports & API clients
+   - Edition diff: revised PDF + saved project → re-translate only changed pages
+   - Managed glossary, injected per page (only terms found on that page)
 ═══════════════════════════════════════════════════════════════
 """
 
@@ -17,7 +24,17 @@ import os
 import io
 import time
 import hashlib
-from datetime import datetime
+import json
+import csv
+import difflib
+import threading
+import tempfile
+import zipfile
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from xml.sax.saxutils import escape as xml_escape
+from datetime import datetime, timezone
 from docx import Document as DocxDocument
 from docx.shared import Pt, Inches, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
@@ -27,6 +44,19 @@ from docx.enum.text import WD_ALIGN_PARAGRAPH
 # ═══════════════════════════════════════════════════════════════
 st.set_page_config(page_title="অদম্য প্রেস — Book Translator", page_icon="📚", layout="wide")
 
+# ═══════════════════════════════════════════════════════════════
+# RERUN PROFILER (Streamlit re-executes this script on every widget change)
+# ═══════════════════════════════════════════════════════════════
+_profile = {"last": time.perf_counter(), "sections": []}
+
+
+def profile_mark(section):
+    """Close the current script section, recording ms since the previous mark."""
+    now = time.perf_counter()
+    _profile["sections"].append((section, (now - _profile["last"]) * 1000))
+    _profile["last"] = now
+
+
 # ═══════════════════════════════════════════════════════════════
 # CUSTOM CSS
 # ═══════════════════════════════════════════════════════════════
@@ -56,7 +86,8 @@ st.markdown("""
     .lock-icon { font-size: 4rem; margin-bottom: 20px; }
     div[data-testid="stExpander"] { border: 1px solid #2d4a3e; border-radius: 10px; }
 </style>
-""", unsafe_allow_html=True)
+""", unsafe_allow_html=True)  # Must be re-sent every rerun — Streamlit rebuilds the page each time
+profile_mark("page config + CSS")
 
 # ═══════════════════════════════════════════════════════════════
 # SYSTEM PROMPT (shared across all APIs)
@@ -66,7 +97,7 @@ SYSTEM_PROMPT = """You are a professional English-to-Bangla book translator for
 ## TRANSLATION RULES
 
 ### Language Priority
-- **Use English** for commonly understood terms: Focus, Energy, Goal, Priority, Distraction, Productivity, Mindset, Confidence, Resilience, Motivation, Discipline, Process, Comfort Zone, Emotion, Stress, Balance, Relationship, Communication, Trust, Challenge, Growth, Leadership, Strategy, Marketing, Brand, etc.
+- **Use English** for commonly understood terms (Focus, Energy, Goal, etc.). Each request may include a "Glossary for this page" — follow it exactly.
 - **Use Bangla** for sentence structure, connectors, verbs, common everyday words, emotional language.
 - **AVOID** complex Bangla: Use "Distraction" not "বিক্ষিপ্ততা", "Resilience" not "স্থিতিস্থাপকতা".
 
@@ -93,6 +124,138 @@ SYSTEM_PROMPT = """You are a professional English-to-Bangla book translator for
 
 IMPORTANT: Page number MUST match the ORIGINAL source PDF page number."""
 
+# ═══════════════════════════════════════════════════════════════
+# GLOSSARY (per-page injection — only terms that occur on the page are sent)
+# ═══════════════════════════════════════════════════════════════
+# (term, Bangla rendering) — empty rendering means keep the term in English
+DEFAULT_GLOSSARY = [(t, "") for t in (
+    "Focus", "Energy", "Goal", "Priority", "Distraction", "Productivity", "Mindset", "Confidence",
+    "Resilience", "Motivation", "Discipline", "Process", "Comfort Zone", "Emotion", "Stress", "Balance",
+    "Relationship", "Communication", "Trust", "Challenge", "Growth", "Leadership", "Strategy",
+    "Marketing", "Brand",
+)]
+
+
+def estimate_tokens(text):
+    """Rough prompt-token estimate (~4 UTF-8 bytes per token) — for savings reporting only."""
+    return len(text.encode("utf-8")) // 4
+
+
+def _glossary_line(term, rendering):
+    return f"- {term} → {rendering}" if rendering else f"- {term} → keep in English"
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_glossary_entries(_glossary_file, file_key):
+    """Parse an uploaded glossary (`file_key` = content hash): CSV/TXT rows of `term[,Bangla rendering]`,
+    optional `term` header, # comments."""
+    _glossary_file.seek(0)
+    text = _glossary_file.read().decode("utf-8-sig", errors="replace")
+    entries = []
+    for row in csv.reader(io.StringIO(text)):
+        if not row or not row[0].strip() or row[0].lstrip().startswith("#"): continue
+        term = row[0].strip()
+        if not entries and term.lower() == "term": continue
+        entries.append((term, row[1].strip() if len(row) > 1 else ""))
+    return entries
+
+
+def compile_glossary(terms):
+    """Aho–Corasick automaton over lower-cased terms — one pass per page, whatever the glossary size."""
+    goto, fail, out = [{}], [0], [[]]
+    for idx, term in enumerate(terms):
+        node = 0
+        for ch in term.lower():
+            nxt = goto[node].get(ch)
+            if nxt is None:
+                nxt = len(goto)
+                goto[node][ch] = nxt
+                goto.append({}); fail.append(0); out.append([])
+            node = nxt
+        out[node].append(idx)
+
+    queue = deque(goto[0].values())
+    while queue:
+        node = queue.popleft()
+        for ch, nxt in goto[node].items():
+            queue.append(nxt)
+            f = fail[node]
+            while f and ch not in goto[f]:
+                f = fail[f]
+            fail[nxt] = goto[f].get(ch, 0)
+            out[nxt] = out[nxt] + out[fail[nxt]]
+    return {"goto": goto, "fail": fail, "out": out, "lens": [len(t.lower()) for t in terms]}
+
+
+def _is_whole_word(low, start, end):
+    """Term boundary check that still accepts simple plurals/possessives (Goals, Processes, Brand's)."""
+    if start > 0 and low[start - 1].isalnum():
+        return False
+    for suffix in ("'s", "es", "s", ""):
+        stop = end + len(suffix)
+        if low.startswith(suffix, end) and (stop == len(low) or not low[stop].isalnum()):
+            return True
+    return False
+
+
+def match_glossary(matcher, text):
+    """Indices of glossary terms that occur in `text` as whole words (case-insensitive)."""
+    goto, fail, out, lens = matcher["goto"], matcher["fail"], matcher["out"], matcher["lens"]
+    low = text.lower()
+    found = set()
+    node = 0
+    for pos, ch in enumerate(low):
+        while node and ch not in goto[node]:
+            node = fail[node]
+        node = goto[node].get(ch, 0)
+        for idx in out[node]:
+            if idx not in found and _is_whole_word(low, pos - lens[idx] + 1, pos + 1):
+                found.add(idx)
+    return found
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_glossary(glossary_key, _entries):
+    """Compiled glossary shared by every session using the same entries (`glossary_key` = content hash)."""
+    entries = list(_entries)
+    full_block = "## Glossary\n" + "\n".join(_glossary_line(t, r) for t, r in entries) + "\n\n"
+    return {"key": glossary_key, "entries": entries, "matcher": compile_glossary([t for t, _ in entries]),
+            "full_tokens": estimate_tokens(full_block)}
+
+
+def new_glossary_stats():
+    """Savings counters; the lock lets background (prefetch) and script threads share them."""
+    return {"pages": 0, "injected": 0, "saved_tokens": 0, "lock": threading.Lock()}
+
+
+def glossary_prompt(glossary, page_text):
+    """(prompt section with only this page's glossary hits, number of hits)."""
+    if not glossary:
+        return "", 0
+    hits = sorted(match_glossary(glossary["matcher"], page_text))
+    block = ("## Glossary for this page\n" +
+             "\n".join(_glossary_line(*glossary["entries"][i]) for i in hits) + "\n\n") if hits else ""
+    return block, len(hits)
+
+
+def record_glossary_savings(glossary, block, hits):
+    """Book the tokens one successful call saved vs. sending the whole glossary."""
+    stats = glossary.get("stats") if glossary else None
+    if stats is None:
+        return
+    with stats["lock"]:
+        stats["pages"] += 1
+        stats["injected"] += hits
+        stats["saved_tokens"] += glossary["full_tokens"] - estimate_tokens(block)
+
+
+def merge_glossary_stats(into, stats):
+    """Add a prefetch job's tally to the session's once its pages are actually used."""
+    with into["lock"], stats["lock"]:
+        for k in ("pages", "injected", "saved_tokens"):
+            into[k] += stats[k]
+
+
 # ═══════════════════════════════════════════════════════════════
 # API PROVIDERS & MODELS
 # ═══════════════════════════════════════════════════════════════
@@ -147,14 +310,35 @@ PAGE_COST_EST = {
 }
 
 
+@st.cache_data(show_spinner=False)
+def cost_table_md(provider):
+    """Sidebar cost table for one provider."""
+    return (f"""**💰 Cost ({provider}):**\n\n| Model | /100 pages |\n|-------|:---:|\n""" +
+            "\n".join(f"| {k} | ~${PAGE_COST_EST.get(v, 0.01)*100:.2f} |"
+                       for k, v in API_PROVIDERS[provider]["models"].items()))
+
+
 # ═══════════════════════════════════════════════════════════════
 # API CALL FUNCTIONS
 # ═══════════════════════════════════════════════════════════════
 
+@st.cache_resource(max_entries=16, show_spinner=False)
+def get_client(provider, api_key):
+    """SDK import + client construction once per key (reuses connection pools across pages)."""
+    if provider == "Anthropic (Claude)":
+        import anthropic
+        return anthropic.Anthropic(api_key=api_key)
+    elif provider == "OpenAI (GPT)":
+        from openai import OpenAI
+        return OpenAI(api_key=api_key)
+    elif provider == "Google (Gemini)":
+        import google.generativeai as genai
+        return genai
+
+
 def call_anthropic(api_key, model, system, user_msg):
     """Call Anthropic Claude API."""
-    import anthropic
-    client = anthropic.Anthropic(api_key=api_key)
+    client = get_client("Anthropic (Claude)", api_key)
     response = client.messages.create(
         model=model, max_tokens=4096, system=system,
         messages=[{"role": "user", "content": user_msg}]
@@ -169,8 +353,7 @@ def call_anthropic(api_key, model, system, user_msg):
 
 def call_openai(api_key, model, system, user_msg):
     """Call OpenAI GPT API."""
-    from openai import OpenAI
-    client = OpenAI(api_key=api_key)
+    client = get_client("OpenAI (GPT)", api_key)
     response = client.chat.completions.create(
         model=model, max_tokens=4096,
         messages=[
@@ -188,8 +371,8 @@ def call_openai(api_key, model, system, user_msg):
 
 def call_gemini(api_key, model, system, user_msg):
     """Call Google Gemini API."""
-    import google.generativeai as genai
-    genai.configure(api_key=api_key)
+    genai = get_client("Google (Gemini)", api_key)
+    genai.configure(api_key=api_key)  # Module-global config — set per call since sessions may use different keys
     gmodel = genai.GenerativeModel(model, system_instruction=system)
     response = gmodel.generate_content(user_msg)
     text = response.text
@@ -200,27 +383,142 @@ def call_gemini(api_key, model, system, user_msg):
     return text, in_t, out_t, cost
 
 
-def translate_single_page(api_key, provider, model, page_num, page_text):
-    """Translate a single page using the selected API provider."""
+def translate_single_page(api_key, provider, model, page_num, page_text, user="", on_wait=None, glossary=None,
+                          cancel=None):
+    """Translate a single page using the selected API provider (queued through the scheduler)."""
+    glossary_block, glossary_hits = glossary_prompt(glossary, page_text)
     user_msg = (
         f"Translate this page to Bangla. This is PAGE {page_num} — output as পৃষ্ঠা {int_to_bangla(page_num)}.\n"
         f"Keep ALL **bold**, *italic*, # heading formatting. Keep content COMPACT — no extra spacing.\n\n"
+        f"{glossary_block}"
         f"--- PAGE {page_num} ---\n{page_text}"
     )
 
-    if provider == "Anthropic (Claude)":
-        return call_anthropic(api_key, model, SYSTEM_PROMPT, user_msg)
-    elif provider == "OpenAI (GPT)":
-        return call_openai(api_key, model, SYSTEM_PROMPT, user_msg)
-    elif provider == "Google (Gemini)":
-        return call_gemini(api_key, model, SYSTEM_PROMPT, user_msg)
+    with scheduled_call(api_key, user, on_wait, cancel):
+        if provider == "Anthropic (Claude)":
+            result = call_anthropic(api_key, model, SYSTEM_PROMPT, user_msg)
+        elif provider == "OpenAI (GPT)":
+            result = call_openai(api_key, model, SYSTEM_PROMPT, user_msg)
+        elif provider == "Google (Gemini)":
+            result = call_gemini(api_key, model, SYSTEM_PROMPT, user_msg)
+        else:
+            return None
+    record_glossary_savings(glossary, glossary_block, glossary_hits)  # Only calls that succeeded count
+    return result
+
+
+# ═══════════════════════════════════════════════════════════════
+# SCHEDULER (process-wide — every session's API calls go through it)
+# ═══════════════════════════════════════════════════════════════
+MAX_CONCURRENT_CALLS = int(os.environ.get("MAX_CONCURRENT_CALLS", "6"))  # All sessions, all keys
+MAX_CALLS_PER_KEY = int(os.environ.get("MAX_CALLS_PER_KEY", "2"))        # Per API key
+
+
+@st.cache_resource
+def get_scheduler():
+    """One scheduler per server process — st.cache_resource shares it across sessions and reruns."""
+    return {"cond": threading.Condition(), "running": 0, "per_key": {}, "queues": {},
+            "last_served": {}, "served": 0}
+
+
+def _turn_order(sched):
+    """Waiting users, least recently served first — round-robin that never lets a big job starve others."""
+    return sorted(sched["queues"], key=lambda u: sched["last_served"].get(u, 0))
+
+
+def _dispatch(sched):
+    """Grant free slots to waiting users in turn order. Caller holds sched['cond']."""
+    granted = False
+    while sched["running"] < MAX_CONCURRENT_CALLS:
+        for user in _turn_order(sched):
+            ticket = sched["queues"][user][0]
+            if sched["per_key"].get(ticket["key"], 0) < MAX_CALLS_PER_KEY:
+                break
+        else:
+            break  # Nobody eligible — every waiter's key is at its cap
+
+        sched["queues"][user].popleft()
+        if not sched["queues"][user]:
+            del sched["queues"][user]
+        ticket["granted"] = True
+        sched["running"] += 1
+        sched["per_key"][ticket["key"]] = sched["per_key"].get(ticket["key"], 0) + 1
+        sched["served"] += 1
+        sched["last_served"][user] = sched["served"]
+        granted = True
+
+    if len(sched["last_served"]) > 1000:  # Forget long-gone sessions
+        sched["last_served"] = {u: n for u, n in sched["last_served"].items() if u in sched["queues"]}
+    if granted:
+        sched["cond"].notify_all()
+
+
+def queue_status(sched, user=""):
+    """(user's position among waiting users or 0, waiting calls, running calls)."""
+    with sched["cond"]:
+        order = _turn_order(sched)
+        waiting = sum(len(q) for q in sched["queues"].values())
+        return (order.index(user) + 1 if user in order else 0), waiting, sched["running"]
+
+
+class CallCancelled(Exception):
+    """Raised by scheduled_call when its `cancel` event fires before the API call starts."""
+
+
+@contextmanager
+def scheduled_call(api_key, user, on_wait=None, cancel=None):
+    """Hold one global + per-key slot for the duration of an API call.
+
+    `on_wait(position, waiting)` is called while queued; it runs outside the lock, so it may
+    touch st.* (and be interrupted by a rerun) without stalling other sessions.
+    `cancel` (threading.Event) is checked while queued and again once the slot is granted, so a
+    cancelled caller never reaches the provider.
+    """
+    sched = SCHEDULER
+    ticket = {"key": hashlib.sha256(api_key.encode()).hexdigest()[:12], "granted": False}
+    with sched["cond"]:
+        sched["queues"].setdefault(user, deque()).append(ticket)
+        _dispatch(sched)
+    try:
+        while not ticket["granted"]:
+            with sched["cond"]:
+                sched["cond"].wait_for(lambda: ticket["granted"], timeout=0.5)
+            if cancel is not None and cancel.is_set():
+                raise CallCancelled()
+            if not ticket["granted"] and on_wait:
+                pos, waiting, _ = queue_status(sched, user)
+                on_wait(pos, waiting)
+        if cancel is not None and cancel.is_set():
+            raise CallCancelled()  # Slot granted after cancel — release it unused
+        yield
+    finally:
+        with sched["cond"]:
+            if ticket["granted"]:
+                sched["running"] -= 1
+                sched["per_key"][ticket["key"]] -= 1
+                if not sched["per_key"][ticket["key"]]:
+                    del sched["per_key"][ticket["key"]]
+            else:
+                # Abandoned while queued (rerun, reset, closed tab)
+                q = sched["queues"].get(user)
+                if q and ticket in q:
+                    q.remove(ticket)
+                    if not q:
+                        del sched["queues"][user]
+            _dispatch(sched)
+
+
+SCHEDULER = get_scheduler()
 
 
 # ═══════════════════════════════════════════════════════════════
 # HELPER FUNCTIONS
 # ═══════════════════════════════════════════════════════════════
 
-def extract_pages(pdf_file, start_page, end_page):
+@st.cache_data(max_entries=4, show_spinner=False)
+def extract_pages(_pdf_file, start_page, end_page, file_key):
+    """Cached per (file_key, range) — `file_key` must be a content hash; the file object is not hashed."""
+    pdf_file = _pdf_file
     pdf_file.seek(0)
     doc = fitz.open(stream=pdf_file.read(), filetype="pdf")
     pages = []
@@ -235,19 +533,25 @@ def extract_pages(pdf_file, start_page, end_page):
 
 
 def parse_single_page(raw_text, expected_page_num):
-    """Parse translation output for a single page."""
+    """Parse translation output for a single page.
+
+    `src` keeps the source page number and `marker_ok` records whether the model's
+    পৃষ্ঠা marker agreed with it — both feed the repair queue.
+    """
     pattern = r'===\s*পৃষ্ঠা\s*([০-৯]+)\s*==='
     parts = re.split(pattern, raw_text)
     if len(parts) > 1:
         page_num = parts[1]
         content = parts[2].strip() if len(parts) > 2 else ""
         content = re.sub(r'\n---\s*$', '', content).strip()
-        return {"page": page_num, "content": content}
+        return {"page": page_num, "content": content, "src": expected_page_num,
+                "marker_ok": bangla_to_int(page_num) == expected_page_num}
     else:
         # No marker found — use raw text with expected page num
         content = raw_text.strip()
         content = re.sub(r'\n---\s*$', '', content).strip()
-        return {"page": int_to_bangla(expected_page_num), "content": content}
+        return {"page": int_to_bangla(expected_page_num), "content": content, "src": expected_page_num,
+                "marker_ok": False}
 
 
 def bangla_to_int(s):
@@ -260,35 +564,251 @@ def int_to_bangla(n):
     return "".join(m.get(c, c) for c in str(n))
 
 
-def add_formatted_text(para, text, base_bold=False, base_italic=False, font_size=Pt(11), font_name='Noto Sans Bengali'):
-    """Parse **bold**, *italic*, ***both*** and add runs."""
+# ═══════════════════════════════════════════════════════════════
+# REPAIR QUEUE (failed & suspect pages)
+# ═══════════════════════════════════════════════════════════════
+REPAIR_MIN_RATIO = 0.3  # Output/input character ratio below this looks like a dropped chunk
+SENTENCE_ENDS = ('।', '.', '!', '?', '"', '”', "'", '’', ')', ':', '*', '—')
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def find_suspect_pages(rev_key, _translated_pages, _pages_data):
+    """Return [(index, source page, reason)] for pages that failed or look wrong. Cached per `rev_key`."""
+    translated_pages, pages_data = _translated_pages, _pages_data
+    source = dict(pages_data)
+    suspects = []
+    for idx, pd in enumerate(translated_pages):
+        src = pd.get("src") or bangla_to_int(pd["page"])
+        content = pd["content"]
+        src_text = source.get(src, "")
+        if content.startswith("[Translation Error:"):
+            reason = "failed"
+        elif not content:
+            reason = "empty output"
+        elif not pd.get("marker_ok", True) and bangla_to_int(pd["page"]) == src:
+            reason = "missing পৃষ্ঠা marker"
+        elif not pd.get("marker_ok", True):
+            reason = f"wrong marker পৃষ্ঠা {pd['page']} (expected {int_to_bangla(src)})"
+        elif src_text and len(content) / len(src_text) < REPAIR_MIN_RATIO:
+            reason = f"short output ({len(content) / len(src_text):.0%} of source)"
+        elif src_text.rstrip().endswith(SENTENCE_ENDS) and not content.rstrip().endswith(SENTENCE_ENDS):
+            reason = "truncated final sentence"
+        else:
+            continue
+        suspects.append((idx, src, reason))
+    return suspects
+
+
+# ═══════════════════════════════════════════════════════════════
+# EDITION DIFF (revised PDF vs saved project — re-translate only changed pages)
+# ═══════════════════════════════════════════════════════════════
+PROJECT_FORMAT = "odommo-translation-project"
+DIFF_MIN_SIMILARITY = 0.6  # Below this an unmatched page counts as new rather than modified
+DIFF_WINDOW = 6            # Old pages searched either side of the expected position
+
+
+def build_project_json(translated_pages, pages_data, book_title, book_author, translator_name="", model=""):
+    """Saved project: English source + translation per page, so a later edition can be diffed against it.
+
+    Written page by page like the exporters. Returns an open temp file positioned at 0.
+    """
+    source = dict(pages_data)
+    header = json.dumps({"format": PROJECT_FORMAT, "version": 1, "book_title": book_title,
+                         "book_author": book_author, "translator": translator_name, "model": model,
+                         "saved": datetime.now().isoformat(timespec="seconds"), "pages": []},
+                        ensure_ascii=False)
+    out = tempfile.TemporaryFile()
+    out.write(header[:-2].encode("utf-8"))  # Reopen the empty "pages" list
+    for n, pd in enumerate(translated_pages):
+        src = pd.get("src") or bangla_to_int(pd["page"])
+        entry = {"src": src, "source": source.get(src, ""), "page": pd["page"], "content": pd["content"]}
+        out.write(((", " if n else "") + json.dumps(entry, ensure_ascii=False)).encode("utf-8"))
+    out.write(b"]}")
+    out.seek(0)
+    return out
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_project(_project_file, file_key):
+    """Parse a saved project (`file_key` = content hash). Raises ValueError for anything that is not one."""
+    _project_file.seek(0)
+    try:
+        project = json.load(_project_file)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise ValueError(f"not valid JSON ({e})")
+    if not isinstance(project, dict) or project.get("format") != PROJECT_FORMAT:
+        raise ValueError("not an অদম্য প্রেস translation project")
+    if not isinstance(project.get("pages"), list):
+        raise ValueError("project has no page list")
+    for n, p in enumerate(project["pages"], 1):
+        if (not isinstance(p, dict) or type(p.get("src")) is not int
+                or not isinstance(p.get("source", ""), str) or not isinstance(p.get("content"), str)):
+            raise ValueError(f"page entry {n} is malformed (needs integer src, source & content text)")
+    pages = [p for p in project["pages"] if p.get("source")]
+    if not pages:
+        raise ValueError("project has no pages with source text")
+    project["pages"] = sorted(pages, key=lambda p: p["src"])
+    return project
+
+
+def _norm_text(text):
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+@st.cache_data(max_entries=4, show_spinner="🔁 Aligning editions...")
+def align_editions(diff_key, _old_pages, _new_pages):
+    """Match new-edition pages to old ones, tolerating pages that shifted.
+
+    Fuzzy matching compares word sequences — character-level matching of whole pages is far too slow.
+    Returns ([(new page, status, old index, similarity)], [removed old indices]) where status is
+    'unchanged' (same content hash), 'modified' (fuzzy match), or 'new'.
+    """
+    old_norm = [_norm_text(p["source"]) for p in _old_pages]
+    old_words = [text.split() for text in old_norm]
+    by_hash = {}
+    for i, text in enumerate(old_norm):
+        by_hash.setdefault(hashlib.md5(text.encode()).hexdigest(), []).append(i)
+
+    # Pass 1 — identical content hashes anchor the alignment
+    used, match = set(), [None] * len(_new_pages)
+    for j, (_, text) in enumerate(_new_pages):
+        for i in by_hash.get(hashlib.md5(_norm_text(text).encode()).hexdigest(), []):
+            if i not in used:
+                match[j] = (i, 1.0); used.add(i)
+                break
+
+    # Pass 2 — fuzzy match near the position implied by the previous anchor
+    anchor_new, anchor_old = -1, -1
+    for j, (_, text) in enumerate(_new_pages):
+        if match[j]:
+            anchor_new, anchor_old = j, match[j][0]
+            continue
+        expected = anchor_old + (j - anchor_new)
+        words = _norm_text(text).split()
+        best_i, best_r = None, 0.0
+        for i in range(max(0, expected - DIFF_WINDOW), min(len(_old_pages), expected + DIFF_WINDOW + 1)):
+            if i in used: continue
+            sm = difflib.SequenceMatcher(None, old_words[i], words)
+            if sm.real_quick_ratio() <= best_r or sm.quick_ratio() <= best_r: continue
+            r = sm.ratio()
+            if r > best_r: best_i, best_r = i, r
+        if best_i is not None and best_r >= DIFF_MIN_SIMILARITY:
+            match[j] = (best_i, best_r); used.add(best_i)
+            anchor_new, anchor_old = j, best_i
+
+    rows = []
+    for j, (num, _) in enumerate(_new_pages):
+        if match[j] is None:
+            rows.append((num, "new", None, 0.0))
+        else:
+            i, r = match[j]
+            rows.append((num, "unchanged" if r == 1.0 else "modified", i, r))
+    return rows, [i for i in range(len(_old_pages)) if i not in used]
+
+
+def edition_report_md(rows, removed, old_pages, book_title):
+    """Markdown change report for an edition diff."""
+    counts = {s: sum(1 for r in rows if r[1] == s) for s in ("unchanged", "modified", "new")}
+    lines = [f"# Edition Change Report — {book_title}", "",
+             f"Unchanged: {counts['unchanged']} | Modified: {counts['modified']} | New: {counts['new']} "
+             f"| Removed: {len(removed)}", "",
+             "| New page | Status | Old page | Similarity |", "|---:|---|---:|---:|"]
+    for num, status, i, sim in rows:
+        old = old_pages[i]["src"] if i is not None else "—"
+        lines.append(f"| {num} | {status} | {old} | {sim:.0%} |")
+    if removed:
+        lines += ["", "Removed old pages: " + ", ".join(str(old_pages[i]["src"]) for i in removed)]
+    return "\n".join(lines) + "\n"
+
+
+# ═══════════════════════════════════════════════════════════════
+# EXPORT (streamed page-by-page to a temp file — constant memory)
+# ═══════════════════════════════════════════════════════════════
+FONT_NAME = 'Noto Sans Bengali'
+_XML_BAD_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def iter_page_blocks(content):
+    """Classify translated lines into (kind, text) blocks. Consecutive blank lines collapse to one."""
+    skip_empty = False
+    for line in content.split('\n'):
+        stripped = line.strip()
+        if not stripped:
+            if not skip_empty:
+                yield "blank", ""
+                skip_empty = True
+            continue
+        skip_empty = False
+
+        if stripped.startswith('### '): yield "h3", stripped[4:]
+        elif stripped.startswith('## '): yield "h2", stripped[3:]
+        elif stripped.startswith('# '): yield "h1", stripped[2:]
+        elif stripped.startswith('> '): yield "quote", stripped[2:]
+        elif re.match(r'^[০-৯]+[\.\)]\s', stripped): yield "numbered", stripped
+        elif stripped.startswith('• ') or stripped.startswith('- '): yield "bullet", '• ' + stripped[2:]
+        else: yield "para", stripped
+
+
+def iter_formatted_runs(text, base_bold=False, base_italic=False):
+    """Split **bold**, *italic*, ***both*** markup into (text, bold, italic) runs."""
     pattern = r'(\*\*\*(.+?)\*\*\*|\*\*(.+?)\*\*|\*(.+?)\*)'
     last = 0
     for m in re.finditer(pattern, text):
-        before = text[last:m.start()]
-        if before:
-            r = para.add_run(before); r.font.size = font_size; r.font.name = font_name
-            r.bold = base_bold; r.italic = base_italic
-        if m.group(2):
-            r = para.add_run(m.group(2)); r.bold = True; r.italic = True
-        elif m.group(3):
-            r = para.add_run(m.group(3)); r.bold = True; r.italic = base_italic
-        elif m.group(4):
-            r = para.add_run(m.group(4)); r.bold = base_bold; r.italic = True
-        r.font.size = font_size; r.font.name = font_name
+        if m.start() > last:
+            yield text[last:m.start()], base_bold, base_italic
+        if m.group(2): yield m.group(2), True, True
+        elif m.group(3): yield m.group(3), True, base_italic
+        elif m.group(4): yield m.group(4), base_bold, True
         last = m.end()
-    rem = text[last:]
-    if rem:
-        r = para.add_run(rem); r.font.size = font_size; r.font.name = font_name
-        r.bold = base_bold; r.italic = base_italic
+    if last < len(text):
+        yield text[last:], base_bold, base_italic
+
+
+def iter_export_pages(translated_pages):
+    """The one page sequence every exporter consumes: (page_num, blocks iterator)."""
+    for page_data in translated_pages:
+        yield page_data["page"], iter_page_blocks(page_data["content"])
+
+
+# ── DOCX ──
+# Paragraph layout per block kind: (space_before pt, space_after pt, line_spacing, left_indent in, font pt, bold, italic)
+DOCX_BLOCK_STYLE = {
+    "blank":    (0, 0, 0.5, 0, 10.5, False, False),
+    "h3":       (4, 2, None, 0, 11.5, True, False),
+    "h2":       (6, 3, None, 0, 13, True, False),
+    "h1":       (8, 4, None, 0, 14, True, False),
+    "quote":    (3, 3, None, 0.4, 10.5, False, True),
+    "numbered": (1, 1, None, 0.25, 10.5, False, False),
+    "bullet":   (1, 1, None, 0.25, 10.5, False, False),
+    "para":     (0, 2, 1.05, 0, 10.5, False, False),
+}
 
 
-def build_docx(translated_pages, book_title, book_author, translator_name=""):
-    """Build COMPACT DOCX matching original book layout."""
+def _docx_run_xml(text, size_pt, bold=False, italic=False, color=None):
+    props = f'<w:rFonts w:ascii="{FONT_NAME}" w:hAnsi="{FONT_NAME}"/>'
+    if bold: props += '<w:b/>'
+    if italic: props += '<w:i/>'
+    if color: props += f'<w:color w:val="{color}"/>'
+    props += f'<w:sz w:val="{int(size_pt * 2)}"/>'
+    text = xml_escape(_XML_BAD_CHARS.sub('', text))
+    return f'<w:r><w:rPr>{props}</w:rPr><w:t xml:space="preserve">{text}</w:t></w:r>'
+
+
+def _docx_para_xml(runs, before=0, after=2, line=None, indent=0, align=None):
+    spacing = f'w:before="{int(before * 20)}" w:after="{int(after * 20)}"'
+    if line: spacing += f' w:line="{int(line * 240)}" w:lineRule="auto"'
+    props = f'<w:spacing {spacing}/>'
+    if indent: props += f'<w:ind w:left="{int(indent * 1440)}"/>'
+    if align: props += f'<w:jc w:val="{align}"/>'
+    return f'<w:p><w:pPr>{props}</w:pPr>{runs}</w:p>'
+
+
+def _docx_skeleton(book_title, book_author, translator_name):
+    """Styles, margins, and title page built once with python-docx — small and fixed-size."""
     doc = DocxDocument()
 
     style = doc.styles['Normal']
-    style.font.name = 'Noto Sans Bengali'
+    style.font.name = FONT_NAME
     style.font.size = Pt(10.5)
     style.paragraph_format.line_spacing = 1.0
     style.paragraph_format.space_before = Pt(0)
@@ -305,105 +825,257 @@ def build_docx(translated_pages, book_title, book_author, translator_name=""):
         doc.add_paragraph()
 
     p = doc.add_paragraph(); p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    r = p.add_run(book_title); r.font.size = Pt(24); r.bold = True; r.font.name = 'Noto Sans Bengali'
+    r = p.add_run(book_title); r.font.size = Pt(24); r.bold = True; r.font.name = FONT_NAME
 
     p = doc.add_paragraph(); p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    r = p.add_run(book_author); r.font.size = Pt(13); r.font.name = 'Noto Sans Bengali'
+    r = p.add_run(book_author); r.font.size = Pt(13); r.font.name = FONT_NAME
 
     doc.add_paragraph()
     p = doc.add_paragraph(); p.alignment = WD_ALIGN_PARAGRAPH.CENTER
     r = p.add_run("অদম্য প্রেস"); r.font.size = Pt(12); r.bold = True
-    r.font.color.rgb = RGBColor(0x4C, 0xAF, 0x50); r.font.name = 'Noto Sans Bengali'
+    r.font.color.rgb = RGBColor(0x4C, 0xAF, 0x50); r.font.name = FONT_NAME
 
     if translator_name:
         p = doc.add_paragraph(); p.alignment = WD_ALIGN_PARAGRAPH.CENTER
         r = p.add_run(f"অনুবাদক: {translator_name}"); r.font.size = Pt(10)
-        r.font.color.rgb = RGBColor(0x66, 0x66, 0x66); r.font.name = 'Noto Sans Bengali'
+        r.font.color.rgb = RGBColor(0x66, 0x66, 0x66); r.font.name = FONT_NAME
         p = doc.add_paragraph(); p.alignment = WD_ALIGN_PARAGRAPH.CENTER
         r = p.add_run(datetime.now().strftime('%d %B %Y')); r.font.size = Pt(9)
-        r.font.color.rgb = RGBColor(0x99, 0x99, 0x99); r.font.name = 'Noto Sans Bengali'
+        r.font.color.rgb = RGBColor(0x99, 0x99, 0x99); r.font.name = FONT_NAME
 
     doc.add_page_break()
+    buf = io.BytesIO(); doc.save(buf)
+    return buf
+
 
-    # ── Content Pages (COMPACT) ──
-    for idx, page_data in enumerate(translated_pages):
-        page_num = page_data["page"]
-        content = page_data["content"]
+def build_docx(translated_pages, book_title, book_author, translator_name=""):
+    """Build COMPACT DOCX matching original book layout.
+
+    Only the title page goes through python-docx; the body XML is written page by page
+    into the zip entry on disk. Returns an open temp file positioned at 0.
+    """
+    skeleton = zipfile.ZipFile(_docx_skeleton(book_title, book_author, translator_name))
+    head = skeleton.read("word/document.xml").decode("utf-8")
+    cut = head.rfind("<w:sectPr")
+    head, tail = head[:cut], head[cut:]
+
+    out = tempfile.TemporaryFile()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        for item in skeleton.infolist():
+            if item.filename != "word/document.xml":
+                zf.writestr(item, skeleton.read(item.filename))
+
+        with zf.open("word/document.xml", "w") as body:
+            body.write(head.encode("utf-8"))
+            first = True
+            for page_num, blocks in iter_export_pages(translated_pages):
+                if not first:
+                    body.write(b'<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+                first = False
+
+                # Small page number — right aligned, minimal space
+                run = _docx_run_xml(f"পৃষ্ঠা {page_num}", 8, italic=True, color="AAAAAA")
+                parts = [_docx_para_xml(run, before=0, after=4, align="right")]
+                for kind, text in blocks:
+                    before, after, line, indent, size, bold, italic = DOCX_BLOCK_STYLE[kind]
+                    runs = "".join(_docx_run_xml(t, size, b, i)
+                                   for t, b, i in iter_formatted_runs(text, bold, italic))
+                    parts.append(_docx_para_xml(runs, before, after, line, indent))
+                body.write("".join(parts).encode("utf-8"))
+
+            # Footer
+            if translator_name:
+                run = _docx_run_xml(f"অনুবাদ: {translator_name} | অদম্য প্রেস | {datetime.now().strftime('%Y')}",
+                                    8, color="999999")
+                body.write(_docx_para_xml(run, align="center").encode("utf-8"))
+            body.write(tail.encode("utf-8"))
+
+    out.seek(0)
+    return out
+
+
+# ── Markdown ──
+MD_BLOCK_PREFIX = {"h3": "### ", "h2": "## ", "h1": "# ", "quote": "> ", "numbered": "", "bullet": "", "para": ""}
+
+
+def build_markdown(translated_pages, book_title, book_author, translator_name=""):
+    """Plain Markdown export, one section per page. Returns an open temp file positioned at 0."""
+    out = tempfile.TemporaryFile()
+    w = io.TextIOWrapper(out, encoding="utf-8", newline="\n")
+    w.write(f"# {book_title}\n\n{book_author}\n\n**অদম্য প্রেস**\n")
+    if translator_name:
+        w.write(f"\nঅনুবাদক: {translator_name} — {datetime.now().strftime('%d %B %Y')}\n")
+    for page_num, blocks in iter_export_pages(translated_pages):
+        w.write(f"\n---\n\n*পৃষ্ঠা {page_num}*\n\n")
+        for kind, text in blocks:
+            if kind == "blank": continue
+            if kind == "bullet": text = "- " + text[2:]
+            w.write(MD_BLOCK_PREFIX[kind] + text + "\n\n")
+    w.flush()
+    w.detach()
+    out.seek(0)
+    return out
+
+
+# ── EPUB ──
+EPUB_BLOCK_TAG = {"h3": "h3", "h2": "h2", "h1": "h1", "quote": "blockquote",
+                  "numbered": "p", "bullet": "p", "para": "p"}
+
+
+def _html_runs(text, bold=False, italic=False):
+    html = ""
+    for t, b, i in iter_formatted_runs(text, bold, italic):
+        t = xml_escape(_XML_BAD_CHARS.sub('', t))
+        if i: t = f"<em>{t}</em>"
+        if b: t = f"<strong>{t}</strong>"
+        html += t
+    return html
+
+
+def _xhtml(title, body):
+    return ('<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n'
+            '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" '
+            f'lang="bn" xml:lang="bn"><head><meta charset="utf-8"/><title>{xml_escape(title)}</title></head>'
+            f'<body>{body}</body></html>')
+
+
+def build_epub(translated_pages, book_title, book_author, translator_name=""):
+    """Minimal EPUB 3, one XHTML file per page. Returns an open temp file positioned at 0."""
+    out = tempfile.TemporaryFile()
+    items = []  # (id, href, page label) — small, kept for the manifest and nav
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        zf.writestr("META-INF/container.xml",
+                    '<?xml version="1.0"?><container version="1.0" '
+                    'xmlns="urn:oasis:names:tc:opendocument:xmlns:container"><rootfiles>'
+                    '<rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+                    '</rootfiles></container>')
+
+        credit = f"<p>অনুবাদক: {xml_escape(translator_name)}</p>" if translator_name else ""
+        zf.writestr("OEBPS/title.xhtml", _xhtml(book_title, f"<h1>{xml_escape(book_title)}</h1>"
+                                                f"<p>{xml_escape(book_author)}</p><p><strong>অদম্য প্রেস</strong></p>{credit}"))
+
+        for n, (page_num, blocks) in enumerate(iter_export_pages(translated_pages), 1):
+            body = f'<p style="text-align:right;font-size:0.7em;color:#aaa"><em>পৃষ্ঠা {page_num}</em></p>'
+            for kind, text in blocks:
+                if kind == "blank": continue
+                bold = kind in ("h1", "h2", "h3")
+                body += f"<{EPUB_BLOCK_TAG[kind]}>{_html_runs(text, bold, kind == 'quote')}</{EPUB_BLOCK_TAG[kind]}>"
+            items.append((f"p{n}", f"page_{n}.xhtml", page_num))
+            zf.writestr(f"OEBPS/page_{n}.xhtml", _xhtml(f"পৃষ্ঠা {page_num}", body))
+
+        nav = "".join(f'<li><a href="{href}">পৃষ্ঠা {label}</a></li>' for _, href, label in items)
+        zf.writestr("OEBPS/nav.xhtml", _xhtml(book_title, f'<nav epub:type="toc"><ol>'
+                                              f'<li><a href="title.xhtml">{xml_escape(book_title)}</a></li>{nav}</ol></nav>'))
+
+        manifest = ('<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>'
+                    '<item id="title" href="title.xhtml" media-type="application/xhtml+xml"/>'
+                    + "".join(f'<item id="{i}" href="{h}" media-type="application/xhtml+xml"/>' for i, h, _ in items))
+        spine = '<itemref idref="title"/>' + "".join(f'<itemref idref="{i}"/>' for i, _, _ in items)
+        uid = hashlib.md5(f"{book_title}_{book_author}_{len(items)}".encode()).hexdigest()
+        zf.writestr("OEBPS/content.opf",
+                    '<?xml version="1.0" encoding="utf-8"?>'
+                    '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="uid">'
+                    '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+                    f'<dc:identifier id="uid">urn:odommo:{uid}</dc:identifier>'
+                    f'<dc:title>{xml_escape(book_title)}</dc:title><dc:creator>{xml_escape(book_author)}</dc:creator>'
+                    '<dc:language>bn</dc:language><dc:publisher>অদম্য প্রেস</dc:publisher>'
+                    f'<meta property="dcterms:modified">{datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")}</meta>'
+                    f'</metadata><manifest>{manifest}</manifest><spine>{spine}</spine></package>')
+
+    out.seek(0)
+    return out
+
+
+EXPORT_FORMATS = {
+    "DOCX": (build_docx, "docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    "Markdown": (build_markdown, "md", "text/markdown"),
+    "EPUB": (build_epub, "epub", "application/epub+zip"),
+}
 
-        # Small page number — right aligned, minimal space
-        p = doc.add_paragraph(); p.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        p.paragraph_format.space_after = Pt(4)
-        r = p.add_run(f"পৃষ্ঠা {page_num}"); r.font.size = Pt(8)
-        r.font.color.rgb = RGBColor(0xAA, 0xAA, 0xAA); r.italic = True; r.font.name = 'Noto Sans Bengali'
 
-        lines = content.split('\n')
-        skip_empty = False
-        for line in lines:
-            stripped = line.strip()
-
-            # Skip consecutive empty lines (compact)
-            if not stripped:
-                if not skip_empty:
-                    p = doc.add_paragraph()
-                    p.paragraph_format.space_before = Pt(0)
-                    p.paragraph_format.space_after = Pt(0)
-                    p.paragraph_format.line_spacing = 0.5
-                    skip_empty = True
+def session_export(scope, key, build):
+    """This session's finished export for `scope`, built once per `key` and kept on disk.
+
+    One temp file per scope ("all", "batch", ...) — a new key closes (and so deletes) the old file.
+    Nothing is shared across sessions. Returns a BufferedReader over the file, which
+    st.download_button accepts (it rejects the BufferedRandom that TemporaryFile returns).
+    """
+    files = st.session_state.setdefault("export_files", {})
+    entry = files.get(scope)
+    if not entry or entry[0] != key:
+        if entry: entry[1].close()
+        files[scope] = entry = (key, build())
+    return open(entry[1].fileno(), "rb", closefd=False)
+
+
+def export_file(fmt, scope, rev_key, translated_pages, book_title, book_author, translator_name=""):
+    """Export in `fmt`, rebuilt only when the translation revision or the cover details change."""
+    return session_export(scope, (fmt, rev_key, book_title, book_author, translator_name),
+                          lambda: EXPORT_FORMATS[fmt][0](translated_pages, book_title, book_author, translator_name))
+
+
+# ═══════════════════════════════════════════════════════════════
+# PREFETCH (speculative next-batch translation during review)
+# ═══════════════════════════════════════════════════════════════
+
+def start_prefetch(api_key, provider, model, batch_pages, key, budget, ledger, user="", glossary=None):
+    """Translate the next batch in a background thread while the current one is reviewed."""
+    job = {"key": key, "pages": batch_pages, "results": {}, "cost": 0.0, "in": 0, "out": 0,
+           "stopped": "", "cancel": threading.Event(), "book_late": True, "ledger": ledger,
+           "glossary_stats": new_glossary_stats()}
+    # Savings are tallied per job and only merged into the session's if the batch is used
+    if glossary:
+        glossary = dict(glossary, stats=job["glossary_stats"])
+    job["thread"] = threading.Thread(target=_prefetch_worker, args=(job, api_key, provider, model, budget, user, glossary),
+                                     daemon=True)
+    job["thread"].start()
+    return job
+
+
+def _prefetch_worker(job, api_key, provider, model, budget, user, glossary):
+    """Background loop — never touches st.*, only the job dict and the shared ledger."""
+    ledger = job["ledger"]
+    est = PAGE_COST_EST.get(model, 0.01)
+    for i, (pg_num, pg_text) in enumerate(job["pages"]):
+        if job["cancel"].is_set():
+            job["stopped"] = "cancelled"; break
+        if job["cost"] + est > budget:
+            job["stopped"] = "budget"; break
+        try:
+            raw, in_t, out_t, cost = translate_single_page(api_key, provider, model, pg_num, pg_text, user,
+                                                           glossary=glossary, cancel=job["cancel"])
+        except CallCancelled:
+            job["stopped"] = "cancelled"; break
+        except Exception:
+            continue  # Failed pages are retried inline when the user continues
+        with ledger["lock"]:
+            job["cost"] += cost; job["in"] += in_t; job["out"] += out_t
+            ledger["spent"] += cost
+            if job["cancel"].is_set():
+                # In-flight call finished after cancel — the script thread books it on its next rerun
+                ledger["wasted"] += cost
+                if job["book_late"]:
+                    ledger["unbooked"] += cost
                 continue
-            skip_empty = False
-
-            if stripped.startswith('### '):
-                p = doc.add_paragraph()
-                p.paragraph_format.space_before = Pt(4)
-                p.paragraph_format.space_after = Pt(2)
-                add_formatted_text(p, stripped[4:], base_bold=True, font_size=Pt(11.5))
-            elif stripped.startswith('## '):
-                p = doc.add_paragraph()
-                p.paragraph_format.space_before = Pt(6)
-                p.paragraph_format.space_after = Pt(3)
-                add_formatted_text(p, stripped[3:], base_bold=True, font_size=Pt(13))
-            elif stripped.startswith('# '):
-                p = doc.add_paragraph()
-                p.paragraph_format.space_before = Pt(8)
-                p.paragraph_format.space_after = Pt(4)
-                add_formatted_text(p, stripped[2:], base_bold=True, font_size=Pt(14))
-            elif stripped.startswith('> '):
-                p = doc.add_paragraph()
-                p.paragraph_format.left_indent = Inches(0.4)
-                p.paragraph_format.space_before = Pt(3)
-                p.paragraph_format.space_after = Pt(3)
-                add_formatted_text(p, stripped[2:], base_italic=True, font_size=Pt(10.5))
-            elif re.match(r'^[০-৯]+[\.\)]\s', stripped):
-                p = doc.add_paragraph()
-                p.paragraph_format.left_indent = Inches(0.25)
-                p.paragraph_format.space_before = Pt(1)
-                p.paragraph_format.space_after = Pt(1)
-                add_formatted_text(p, stripped, font_size=Pt(10.5))
-            elif stripped.startswith('• ') or stripped.startswith('- '):
-                p = doc.add_paragraph()
-                p.paragraph_format.left_indent = Inches(0.25)
-                p.paragraph_format.space_before = Pt(1)
-                p.paragraph_format.space_after = Pt(1)
-                add_formatted_text(p, '• ' + stripped[2:], font_size=Pt(10.5))
-            else:
-                p = doc.add_paragraph()
-                p.paragraph_format.space_before = Pt(0)
-                p.paragraph_format.space_after = Pt(2)
-                p.paragraph_format.line_spacing = 1.05
-                add_formatted_text(p, stripped, font_size=Pt(10.5))
+        job["results"][pg_num] = parse_single_page(raw, pg_num)
+        if i < len(job["pages"]) - 1:
+            time.sleep(0.3)
 
-        # Page break between pages
-        if idx < len(translated_pages) - 1:
-            doc.add_page_break()
 
-    # Footer
-    if translator_name:
-        p = doc.add_paragraph(); p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        r = p.add_run(f"অনুবাদ: {translator_name} | অদম্য প্রেস | {datetime.now().strftime('%Y')}")
-        r.font.size = Pt(8); r.font.color.rgb = RGBColor(0x99, 0x99, 0x99); r.font.name = 'Noto Sans Bengali'
+def cancel_prefetch(job, book_late=True):
+    """Stop a prefetch job and book what it already spent as discarded. Returns that cost.
 
-    buf = io.BytesIO(); doc.save(buf); buf.seek(0)
-    return buf
+    With `book_late`, calls still in flight add their cost to the ledger's "unbooked" amount,
+    which the session drains into its total cost.
+    """
+    with job["ledger"]["lock"]:
+        if job["cancel"].is_set():
+            return 0.0
+        job["book_late"] = book_late
+        job["cancel"].set()
+        job["ledger"]["wasted"] += job["cost"]
+        return job["cost"]
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -413,12 +1085,50 @@ DEFAULTS = {
     "all_translated": [], "current_batch": 0, "translation_status": "idle",
     "logs": [], "total_cost": 0.0, "total_input_tokens": 0, "total_output_tokens": 0,
     "pages_data": [], "batch_result": [], "num_batches": 0, "total_pdf_pages": 0,
-    "extract_hash": "", "authenticated": False, "page_progress": 0,
+    "extract_hash": "", "authenticated": False, "page_progress": 0, "prefetch_job": None,
+    "diff_report": "", "pdf_hash": "", "diff_fresh": [],
 }
 for k, v in DEFAULTS.items():
     if k not in st.session_state:
         st.session_state[k] = [] if isinstance(v, list) else v
 
+# Identifies this browser session to the shared scheduler
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex[:8]
+
+# Per-session glossary injection stats (the compiled glossary itself is shared)
+if "glossary_stats" not in st.session_state:
+    st.session_state.glossary_stats = new_glossary_stats()
+
+# Bumped on every change to the translated pages — the invalidation key for cached exports & scans
+if "translation_rev" not in st.session_state:
+    st.session_state.translation_rev = 0
+
+# Speculative spend survives Reset so discarded prefetch cost is never lost
+if "prefetch_ledger" not in st.session_state:
+    st.session_state.prefetch_ledger = {"spent": 0.0, "wasted": 0.0, "unbooked": 0.0, "lock": threading.Lock()}
+
+# Late costs from prefetch calls that finished after their job was discarded
+with st.session_state.prefetch_ledger["lock"]:
+    late_cost, st.session_state.prefetch_ledger["unbooked"] = st.session_state.prefetch_ledger["unbooked"], 0.0
+st.session_state.total_cost += late_cost
+
+
+def discard_prefetch(book=True):
+    """Cancel any running prefetch and return a log line for its discarded cost.
+
+    The spend is added to the session's total cost, unless `book` is False because the
+    caller is about to clear the totals (Reset, range change) — the ledger still records it.
+    """
+    job = st.session_state.prefetch_job
+    st.session_state.prefetch_job = None
+    if job:
+        wasted = cancel_prefetch(job, book_late=book)
+        if book:
+            st.session_state.total_cost += wasted
+        return f"⚠️ Prefetch cancelled — ${wasted:.4f} speculative spend discarded"
+    return ""
+
 
 # ═══════════════════════════════════════════════════════════════
 # PASSWORD GATE
@@ -450,6 +1160,8 @@ if not st.session_state.authenticated:
     st.stop()
 
 
+profile_mark("setup + state + auth")
+
 # ═══════════════════════════════════════════════════════════════
 # MAIN APP (after authentication)
 # ═══════════════════════════════════════════════════════════════
@@ -505,12 +1217,33 @@ with st.sidebar:
 
     st.divider()
     batch_size = st.selectbox("📦 Review Every", [5, 10, 15, 20], index=1)
+    prefetch_on = st.checkbox("⚡ Prefetch next batch", value=False,
+                              help="Translate the next batch in the background while you review")
+    prefetch_budget = st.number_input("Prefetch budget ($ per batch)", min_value=0.0, value=0.50, step=0.10,
+                                      disabled=not prefetch_on)
+    export_fmt = st.selectbox("📤 Export Format", list(EXPORT_FORMATS.keys()))
+
+    glossary_file = st.file_uploader("📚 Glossary (.csv)", type=["csv", "txt"],
+                                     help="Rows of `term,বাংলা` — leave the second column empty to keep the term in English")
+    glossary_entries = {t.lower(): (t, r) for t, r in DEFAULT_GLOSSARY}
+    if glossary_file:
+        # Content hash, not name/size — the parsed-glossary cache is shared by every session
+        for t, r in load_glossary_entries(glossary_file, hashlib.md5(glossary_file.getvalue()).hexdigest()):
+            glossary_entries[t.lower()] = (t, r)
+    glossary_entries = tuple(glossary_entries.values())
+    glossary_key = hashlib.md5(repr(glossary_entries).encode()).hexdigest()
+    glossary = dict(get_glossary(glossary_key, glossary_entries), stats=st.session_state.glossary_stats)
+    gs = st.session_state.glossary_stats
+    st.caption(f"📚 {len(glossary_entries):,} terms · ~{gs['saved_tokens']:,} prompt tokens saved")
 
     st.divider()
     if st.button("🔄 Reset", use_container_width=True):
+        note = discard_prefetch(book=False)
         for k, v in DEFAULTS.items():
             if k == "authenticated": continue
             st.session_state[k] = [] if isinstance(v, list) else v
+        st.session_state.translation_rev += 1
+        if note: st.session_state.logs.append(note)
         st.rerun()
 
     # Logout
@@ -519,22 +1252,31 @@ with st.sidebar:
         st.rerun()
 
     st.divider()
-    st.markdown(f"""**💰 Cost ({provider}):**\n\n| Model | /100 pages |\n|-------|:---:|\n""" +
-                "\n".join(f"| {k} | ~${PAGE_COST_EST.get(v, 0.01)*100:.2f} |"
-                          for k, v in provider_info["models"].items()))
+    st.markdown(cost_table_md(provider))
+
+    q_pos, q_waiting, q_running = queue_status(SCHEDULER, st.session_state.session_id)
+    st.caption(f"🚦 Server: {q_running}/{MAX_CONCURRENT_CALLS} calls running · {q_waiting} queued"
+               + (f" · you are #{q_pos}" if q_pos else ""))
+
+profile_mark("sidebar")
 
 # ═══════════════════════════════════════════════════════════════
 # MAIN CONTENT
 # ═══════════════════════════════════════════════════════════════
 
 uploaded_file = st.file_uploader("📄 Upload English PDF", type=["pdf"])
+project_file = st.file_uploader("🔁 Previous Translation Project (.json) — optional, for a revised edition",
+                                type=["json"], help="Saved with 💾 Save Project. Only new or changed pages are translated.")
 
 if uploaded_file:
     # Re-extract on range change — ALWAYS reset translation state
     h = hashlib.md5(f"{uploaded_file.name}_{start_page}_{end_page}".encode()).hexdigest()
     if st.session_state.extract_hash != h:
         with st.spinner("📖 Extracting..."):
-            pd, tp = extract_pages(uploaded_file, start_page, end_page)
+            note = discard_prefetch(book=False)
+            # Content hash, not name/size — the extraction cache is shared by every session
+            st.session_state.pdf_hash = hashlib.md5(uploaded_file.getvalue()).hexdigest()
+            pd, tp = extract_pages(uploaded_file, start_page, end_page, st.session_state.pdf_hash)
             st.session_state.pages_data = pd
             st.session_state.total_pdf_pages = tp
             st.session_state.extract_hash = h
@@ -548,6 +1290,10 @@ if uploaded_file:
             st.session_state.total_input_tokens = 0
             st.session_state.total_output_tokens = 0
             st.session_state.page_progress = 0
+            st.session_state.diff_report = ""
+            st.session_state.diff_fresh = []
+            st.session_state.translation_rev += 1
+            if note: st.session_state.logs.append(note)
             st.rerun()  # Force clean re-render with new state
 
     pages_data = st.session_state.pages_data
@@ -583,11 +1329,21 @@ if uploaded_file:
                 f'→ {num_batches} batches of {batch_size} | <strong>{model_choice}</strong> '
                 f'| ⏸️ Review every {batch_size} pages</div>', unsafe_allow_html=True)
 
+    profile_mark("extract + stats")
+
     # ─── State shortcuts ───
     status = st.session_state.translation_status
     current_batch = st.session_state.current_batch
     pages_done = len(st.session_state.all_translated)
     page_progress = st.session_state.page_progress
+    rev_key = f"{st.session_state.session_id}:{st.session_state.translation_rev}"
+    # Prefetch is only valid for the exact batch, range, and model it was started for
+    next_key = (st.session_state.extract_hash, current_batch, batch_size, model, glossary["key"])
+    job = st.session_state.prefetch_job
+    if job and (job["key"] != next_key or not prefetch_on):
+        note = discard_prefetch()
+        st.session_state.logs.append(note)
+        job = None
 
     # ─── Progress Bar (shows per-page progress) ───
     total_pages_overall = num_pages
@@ -618,6 +1374,91 @@ if uploaded_file:
         </div>
         """, unsafe_allow_html=True)
 
+    # ─── EDITION DIFF (revised PDF + saved project → translate only changed pages) ───
+    if project_file and status == "idle" and pages_data:
+        try:
+            # Content hashes, not names — both caches are shared by every session
+            project_hash = hashlib.md5(project_file.getvalue()).hexdigest()
+            project = load_project(project_file, project_hash)
+        except ValueError as e:
+            st.error(f"❌ Project file: {e}")
+            project = None
+        if project:
+            old_pages = project["pages"]
+            rows, removed = align_editions(f"{st.session_state.pdf_hash}:{start_page}-{end_page}:{project_hash}",
+                                           old_pages, pages_data)
+            todo = [r for r in rows if r[1] != "unchanged"
+                    or old_pages[r[2]]["content"].startswith("[Translation Error:")]
+            # Changed pages already paid for in this session (a rerun interrupted the run) are not redone
+            done = {p["src"]: p for p in st.session_state.diff_fresh}
+            pending = [r for r in todo if r[0] not in done]
+            n_same = sum(1 for r in rows if r[1] == "unchanged")
+            n_mod = sum(1 for r in rows if r[1] == "modified")
+            diff_est = len(pending) * PAGE_COST_EST.get(model, 0.01)
+
+            with st.expander(f"🔁 Edition Diff — {project.get('book_title') or 'previous translation'}", expanded=True):
+                st.markdown(f"♻️ **{n_same}** unchanged | ✏️ **{n_mod}** modified | 🆕 **{len(rows) - n_same - n_mod}** new "
+                            f"| 🗑️ **{len(removed)}** removed → translate **{len(todo)}** of {num_pages} pages "
+                            f"(~${diff_est:.2f} instead of ~${est_cost:.2f})")
+                if done:
+                    st.caption(f"♻️ {len(todo) - len(pending)} changed pages already translated — resuming with "
+                               f"{len(pending)} left")
+                if st.button(f"🔁 Translate {len(pending)} changed pages & merge", type="primary",
+                             use_container_width=True, disabled=(not translator_name)):
+                    if not api_key:
+                        st.error(f"❌ Enter {provider_info['key_label']} in the sidebar.")
+                    else:
+                        source = dict(pages_data)
+                        diff_bar = st.progress(0)
+                        status_text = st.empty()
+                        failed = {}
+                        diff_cost = 0.0
+                        errors = []
+                        for i, (num, _, _, _) in enumerate(pending):
+                            diff_bar.progress(i / len(pending), text=f"🔁 Translating changed page {num}...")
+                            try:
+                                raw, in_t, out_t, cost = translate_single_page(
+                                    api_key, provider, model, num, source[num], st.session_state.session_id,
+                                    on_wait=lambda pos, waiting: status_text.warning(
+                                        f"⏳ Server busy — you are #{pos} in queue ({waiting} calls waiting)"),
+                                    glossary=glossary)
+                                # Stored as soon as it is paid for, so an interrupting rerun loses nothing
+                                done[num] = parse_single_page(raw, num)
+                                st.session_state.diff_fresh.append(done[num])
+                                st.session_state.total_cost += cost
+                                st.session_state.total_input_tokens += in_t
+                                st.session_state.total_output_tokens += out_t
+                                diff_cost += cost
+                            except Exception as e:
+                                errors.append(f"Page {num}: {str(e)}")
+                                failed[num] = {"page": int_to_bangla(num), "content": f"[Translation Error: {str(e)}]",
+                                               "src": num}
+                            if i < len(pending) - 1:
+                                time.sleep(0.3)
+
+                        # Reused pages take the new edition's page number
+                        merged = [done.get(num) or failed.get(num) or
+                                  {"page": int_to_bangla(num), "content": old_pages[old_i]["content"],
+                                   "src": num, "marker_ok": True}
+                                  for num, _, old_i, _ in rows]
+                        st.session_state.all_translated = merged
+                        st.session_state.batch_result = []
+                        st.session_state.diff_fresh = []
+                        st.session_state.current_batch = num_batches
+                        st.session_state.translation_status = "complete"
+                        st.session_state.diff_report = edition_report_md(rows, removed, old_pages,
+                                                                         book_title or project.get("book_title") or "Book")
+                        st.session_state.translation_rev += 1
+                        n_resumed = len(todo) - len(pending)
+                        resumed = f" ({n_resumed} from an interrupted run)" if n_resumed else ""
+                        st.session_state.logs.append(
+                            f"✅ Edition diff: {len(todo)} translated{resumed}, {len(rows) - len(todo)} reused "
+                            f"— ${diff_cost:.4f} — {provider}/{model_choice} — by {translator_name} "
+                            f"@ {datetime.now().strftime('%H:%M:%S')}")
+                        for e in errors:
+                            st.session_state.logs.append(f"⚠️ {e}")
+                        st.rerun()
+
     # ─── START / CONTINUE ───
     if status in ["idle", "reviewing"]:
         if current_batch >= num_batches:
@@ -661,12 +1502,35 @@ if uploaded_file:
         batch_out = 0
         errors = []
 
+        # Collect prefetched pages (wait for the background thread if it is still running).
+        # Any job that survived the key check above was started for exactly this batch.
+        prefetched = {}
+        if job:
+            while job["thread"].is_alive():
+                ready = len(job["results"])
+                status_text.info(f"⚡ Waiting for prefetched pages ({ready}/{batch_count})...")
+                progress_bar.progress(ready / batch_count)
+                time.sleep(0.2)
+            prefetched = job["results"]
+            batch_cost += job["cost"]; batch_in += job["in"]; batch_out += job["out"]
+            merge_glossary_stats(st.session_state.glossary_stats, job["glossary_stats"])
+            st.session_state.prefetch_job = None
+
         for i, (pg_num, pg_text) in enumerate(batch_pages):
+            if pg_num in prefetched:
+                page_results.append(prefetched[pg_num])
+                st.session_state.page_progress = i + 1
+                continue
+
             status_text.info(f"📝 Translating page {pg_num} ({i+1}/{batch_count})...")
             progress_bar.progress((i) / batch_count)
 
             try:
-                raw, in_t, out_t, cost = translate_single_page(api_key, provider, model, pg_num, pg_text)
+                raw, in_t, out_t, cost = translate_single_page(
+                    api_key, provider, model, pg_num, pg_text, st.session_state.session_id,
+                    on_wait=lambda pos, waiting: status_text.warning(
+                        f"⏳ Server busy — you are #{pos} in queue ({waiting} calls waiting)"),
+                    glossary=glossary)
                 parsed = parse_single_page(raw, pg_num)
                 page_results.append(parsed)
                 batch_cost += cost
@@ -675,7 +1539,8 @@ if uploaded_file:
                 st.session_state.page_progress = i + 1
             except Exception as e:
                 errors.append(f"Page {pg_num}: {str(e)}")
-                page_results.append({"page": int_to_bangla(pg_num), "content": f"[Translation Error: {str(e)}]"})
+                page_results.append({"page": int_to_bangla(pg_num), "content": f"[Translation Error: {str(e)}]",
+                                     "src": pg_num})
 
             # Small delay to avoid rate limits
             if i < batch_count - 1:
@@ -686,6 +1551,7 @@ if uploaded_file:
 
         # Store results
         st.session_state.all_translated.extend(page_results)
+        st.session_state.translation_rev += 1
         st.session_state.batch_result = page_results
         st.session_state.total_cost += batch_cost
         st.session_state.total_input_tokens += batch_in
@@ -694,8 +1560,9 @@ if uploaded_file:
         st.session_state.page_progress = 0
 
         page_nums = [p[0] for p in batch_pages]
+        pf_note = f" ({len(prefetched)} prefetched)" if prefetched else ""
         log = (f"✅ Batch {batch_idx+1}: p{page_nums[0]}–{page_nums[-1]} "
-               f"— {len(page_results)} pages — ${batch_cost:.4f} "
+               f"— {len(page_results)} pages{pf_note} — ${batch_cost:.4f} "
                f"— {provider}/{model_choice} — by {translator_name} @ {datetime.now().strftime('%H:%M:%S')}")
         st.session_state.logs.append(log)
         if errors:
@@ -711,6 +1578,22 @@ if uploaded_file:
         bn = st.session_state.current_batch
         st.success(f"✅ **Batch {bn}/{num_batches} Complete** — Review, Download, or Continue.")
 
+        # Kick off speculative translation of the next batch while the user reads this one
+        if prefetch_on and api_key and current_batch < num_batches:
+            if not job:
+                nb_start = current_batch * batch_size
+                job = start_prefetch(api_key, provider, model, pages_data[nb_start:nb_start + batch_size],
+                                     next_key, prefetch_budget, st.session_state.prefetch_ledger,
+                                     st.session_state.session_id, glossary)
+                st.session_state.prefetch_job = job
+            ready = len(job["results"])
+            nb_count = len(job["pages"])
+            if job["stopped"] == "budget":
+                st.caption(f"⚡ Prefetch paused at budget — {ready}/{nb_count} pages of batch {bn+1} ready "
+                           f"(${job['cost']:.4f})")
+            else:
+                st.caption(f"⚡ Prefetching batch {bn+1} — {ready}/{nb_count} pages ready (${job['cost']:.4f})")
+
         st.markdown("### 📝 Review Translation")
         with st.expander(f"📖 Batch {bn} — Click to Review", expanded=True):
             for pd in st.session_state.batch_result:
@@ -718,28 +1601,33 @@ if uploaded_file:
                 st.markdown(pd["content"])
                 st.markdown("---")
 
-        st.markdown("### 📥 Download DOCX")
+        st.markdown(f"### 📥 Download {export_fmt}")
+        _, ext, mime = EXPORT_FORMATS[export_fmt]
         c1, c2 = st.columns(2)
         with c1:
             if st.session_state.all_translated:
-                buf = build_docx(st.session_state.all_translated, book_title or "Book",
-                                 book_author or "Author", translator_name)
+                buf = export_file(export_fmt, "all", rev_key, st.session_state.all_translated,
+                                   book_title or "Book", book_author or "Author", translator_name)
                 fp = st.session_state.all_translated[0]["page"]
                 lp = st.session_state.all_translated[-1]["page"]
                 st.download_button(f"📥 All ({len(st.session_state.all_translated)} pages: p{fp}–{lp})",
-                                   data=buf, file_name=f"{book_title or 'book'}_p{bangla_to_int(fp)}-{bangla_to_int(lp)}.docx",
-                                   mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                                   use_container_width=True)
+                                   data=buf, file_name=f"{book_title or 'book'}_p{bangla_to_int(fp)}-{bangla_to_int(lp)}.{ext}",
+                                   mime=mime, use_container_width=True)
         with c2:
             if st.session_state.batch_result:
-                buf2 = build_docx(st.session_state.batch_result, book_title or "Book",
-                                  book_author or "Author", translator_name)
+                buf2 = export_file(export_fmt, "batch", rev_key, st.session_state.batch_result,
+                                    book_title or "Book", book_author or "Author", translator_name)
                 bf = st.session_state.batch_result[0]["page"]
                 bl = st.session_state.batch_result[-1]["page"]
                 st.download_button(f"📥 Batch {bn} (p{bf}–{bl})",
-                                   data=buf2, file_name=f"batch_{bn}_p{bangla_to_int(bf)}-{bangla_to_int(bl)}.docx",
-                                   mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                                   use_container_width=True)
+                                   data=buf2, file_name=f"batch_{bn}_p{bangla_to_int(bf)}-{bangla_to_int(bl)}.{ext}",
+                                   mime=mime, use_container_width=True)
+        st.download_button("💾 Save Project (.json) — reuse for a revised edition",
+                           data=session_export("project", (rev_key, book_title, book_author, translator_name, model),
+                                               lambda: build_project_json(st.session_state.all_translated, pages_data,
+                                                                          book_title, book_author, translator_name, model)),
+                           file_name=f"{book_title or 'book'}_project.json", mime="application/json",
+                           use_container_width=True)
 
     # ─── COMPLETE ───
     if status == "complete":
@@ -754,17 +1642,84 @@ if uploaded_file:
         """, unsafe_allow_html=True)
 
         if st.session_state.all_translated:
-            buf = build_docx(st.session_state.all_translated, book_title or "Book",
-                             book_author or "Author", translator_name)
+            _, ext, mime = EXPORT_FORMATS[export_fmt]
+            buf = export_file(export_fmt, "all", rev_key, st.session_state.all_translated,
+                               book_title or "Book", book_author or "Author", translator_name)
             fp = st.session_state.all_translated[0]["page"]
             lp = st.session_state.all_translated[-1]["page"]
-            st.download_button(f"📥 Download Complete (p{fp}–{lp})", data=buf, type="primary",
-                               file_name=f"{book_title or 'book'}_complete.docx",
-                               mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            st.download_button(f"📥 Download Complete {export_fmt} (p{fp}–{lp})", data=buf, type="primary",
+                               file_name=f"{book_title or 'book'}_complete.{ext}",
+                               mime=mime, use_container_width=True)
+            st.download_button("💾 Save Project (.json) — reuse for a revised edition",
+                               data=session_export("project", (rev_key, book_title, book_author, translator_name, model),
+                                                   lambda: build_project_json(st.session_state.all_translated, pages_data,
+                                                                              book_title, book_author, translator_name, model)),
+                               file_name=f"{book_title or 'book'}_project.json", mime="application/json",
                                use_container_width=True)
 
+        if st.session_state.diff_report:
+            with st.expander("📋 Edition Change Report", expanded=False):
+                st.markdown(st.session_state.diff_report)
+            st.download_button("📋 Download Change Report (.md)", data=st.session_state.diff_report.encode("utf-8"),
+                               file_name=f"{book_title or 'book'}_changes.md", mime="text/markdown",
+                               use_container_width=True)
+
+    profile_mark("translate / review / export")
+
+    # ─── REPAIR QUEUE (re-translate only failed / suspect pages) ───
+    if status in ["reviewing", "complete"] and st.session_state.all_translated:
+        suspects = find_suspect_pages(rev_key, st.session_state.all_translated, pages_data)
+        if suspects:
+            with st.expander(f"🛠️ Repair Queue — {len(suspects)} failed/suspect pages", expanded=False):
+                queue = {f"p{src} — {reason}": (idx, src) for idx, src, reason in suspects}
+                picked = st.multiselect("Pages to re-translate", list(queue), default=list(queue))
+                model_names = list(provider_info["models"].keys())
+                repair_choice = st.selectbox("Repair model", model_names, index=model_names.index(model_choice))
+                repair_model = provider_info["models"][repair_choice]
+                repair_est = len(picked) * PAGE_COST_EST.get(repair_model, 0.01)
+
+                if st.button(f"🛠️ Re-translate {len(picked)} pages (~${repair_est:.4f})",
+                             disabled=(not picked or not api_key), use_container_width=True):
+                    source = dict(pages_data)
+                    repair_bar = st.progress(0)
+                    repair_cost = 0.0
+                    errors = []
+                    for i, label in enumerate(picked):
+                        idx, src = queue[label]
+                        repair_bar.progress(i / len(picked), text=f"🛠️ Re-translating page {src}...")
+                        try:
+                            raw, in_t, out_t, cost = translate_single_page(
+                                api_key, provider, repair_model, src, source[src], st.session_state.session_id,
+                                glossary=glossary)
+                            fixed = parse_single_page(raw, src)
+                            repair_cost += cost
+                            st.session_state.total_input_tokens += in_t
+                            st.session_state.total_output_tokens += out_t
+                            # Splice back in place — the batch view shares the same pages
+                            st.session_state.all_translated[idx] = fixed
+                            for j, bp in enumerate(st.session_state.batch_result):
+                                if bp.get("src") == src:
+                                    st.session_state.batch_result[j] = fixed
+                        except Exception as e:
+                            # Keep the existing (already paid-for) page — it stays in the queue for another try
+                            errors.append(f"Page {src}: repair failed — {str(e)}")
+                        if i < len(picked) - 1:
+                            time.sleep(0.3)
+
+                    st.session_state.total_cost += repair_cost
+                    st.session_state.translation_rev += 1
+                    st.session_state.logs.append(
+                        f"✅ Repair: {len(picked) - len(errors)}/{len(picked)} pages — ${repair_cost:.4f} — {provider}/{repair_choice} "
+                        f"— by {translator_name} @ {datetime.now().strftime('%H:%M:%S')}")
+                    for e in errors:
+                        st.session_state.logs.append(f"⚠️ {e}")
+                    st.rerun()
+
+    profile_mark("repair queue")
+
     # ─── ADMIN PANEL ───
-    if st.session_state.logs:
+    rerun_profiles = st.session_state.get("rerun_profiles", [])
+    if st.session_state.logs or rerun_profiles:
         with st.expander("📋 Admin Panel — Logs", expanded=False):
             st.markdown(f"""
             | Field | Value |
@@ -775,7 +1730,18 @@ if uploaded_file:
             | 📍 Range | Pages {start_page}–{end_page} |
             | 💰 Cost | ${st.session_state.total_cost:.4f} |
             | 🔤 Tokens | {st.session_state.total_input_tokens:,} in / {st.session_state.total_output_tokens:,} out |
+            | 🚦 Scheduler | {MAX_CONCURRENT_CALLS} global / {MAX_CALLS_PER_KEY} per key — {SCHEDULER['served']:,} calls served |
+            | 📚 Glossary | {len(glossary_entries):,} terms — {st.session_state.glossary_stats['injected']:,} injected over {st.session_state.glossary_stats['pages']:,} pages — ~{st.session_state.glossary_stats['saved_tokens']:,} prompt tokens saved |
+            | ⚡ Prefetch | ${st.session_state.prefetch_ledger['spent']:.4f} speculative / ${st.session_state.prefetch_ledger['wasted']:.4f} discarded |
             """)
+            if rerun_profiles:
+                totals = sorted(sum(ms for _, ms in p) for p in rerun_profiles)
+                fast = sum(t < 50 for t in totals)
+                last_ms = sum(ms for _, ms in rerun_profiles[-1])
+                st.markdown(f"**⏱️ Rerun profile** — previous rerun {last_ms:.0f} ms "
+                            f"| median {totals[len(totals) // 2]:.0f} ms | under 50 ms: {fast}/{len(totals)}\n\n"
+                            "| Section | ms |\n|---------|---:|\n" +
+                            "\n".join(f"| {sec} | {ms:.1f} |" for sec, ms in rerun_profiles[-1]))
             st.divider()
             for log in st.session_state.logs:
                 if log.startswith("✅"): st.success(log)
@@ -792,8 +1758,9 @@ else:
     4. **Upload** your English PDF
     5. **Set** page range and review batch size
     6. **Start** — watch per-page progress in real time
-    7. **Review** each batch, **download** DOCX anytime
+    7. **Review** each batch, **download** DOCX / Markdown / EPUB anytime
     8. **Continue** until complete
+    9. **Revised edition?** Upload the new PDF with your saved project (.json) — only changed pages are translated
 
     ---
 
@@ -804,9 +1771,14 @@ else:
     | 🔐 Password Protection | Only authorized users can access |
     | 📊 Real-time Progress | Bar moves for EACH page translated |
     | 📄 Compact DOCX | Matches original book layout — no extra spacing |
+    | 📤 Markdown / EPUB | Same pages, streamed to disk — large books export in constant memory |
     | 🤖 Multi-API | Anthropic Claude, OpenAI GPT, Google Gemini |
     | ✅ Bold/Italic/Heading | All formatting preserved |
     | 👤 Translator Tracking | Name on DOCX cover & admin logs |
+    | 🛠️ Repair Queue | Re-translate only failed or suspect pages, optionally with another model |
+    | 📚 Glossary | Upload publisher terms — each page's prompt carries only the terms on that page |
+    | 🔁 Edition Diff | Revised PDF + saved project — only new or changed pages are translated |
+    | ⚡ Prefetch | Next batch translates in the background while you review |
 
     ---
     *অদম্য প্রেস (Odommo Press) | Online Tech Academy*
@@ -816,3 +1788,7 @@ st.divider()
 st.markdown("<p style='text-align:center;color:#555;font-size:0.8rem;'>"
             "অদম্য প্রেস Book Translator v3.0 | Claude • GPT • Gemini | Online Tech Academy</p>",
             unsafe_allow_html=True)
+
+# Keep the last 20 completed reruns (those ending in st.rerun()/st.stop() never get here)
+profile_mark("admin + footer")
+st.session_state.rerun_profiles = (st.session_state.get("rerun_profiles", []) + [_profile["sections"]])[-20:]